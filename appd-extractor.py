@@ -1,19 +1,25 @@
 import streamlit as st
 import pandas as pd
 import yaml
-import math
 import datetime
 import os
-from io import StringIO
-import xml.etree.ElementTree as ET
+from io import BytesIO
 import requests
 import json
 import urllib.parse
 import time
 import sys
-import subprocess
 import gc
-import pygame
+import itertools
+from lxml import etree
+
+# orjson is optional, it parses the REST responses faster when installed. both parsers raise ValueError
+# subclasses on bad input so validate_json handles them the same way
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 #--- CONFIGURATION SECTION ---
 snes = False
@@ -34,8 +40,9 @@ last_token_fetch_time = ""
 token_expiration = 300
 expiration_buffer = 30
 
-def load_secrets():
-    """Loads API credentials from secrets.yml if it exists."""
+@st.cache_data(show_spinner=False)
+def read_secrets_file(mtime):
+    """Parses secrets.yml, cached on the file's modification time so reruns skip the YAML parse until the file changes."""
     try:
         with open("secrets.yml", "r") as file:
             secrets_data = yaml.safe_load(file)
@@ -43,6 +50,15 @@ def load_secrets():
     except FileNotFoundError:
         return []  # Return an empty list if the file doesn't exist
 
+def load_secrets():
+    """Loads API credentials from secrets.yml if it exists."""
+    try:
+        mtime = os.path.getmtime("secrets.yml")
+    except FileNotFoundError:
+        return []  # Return an empty list if the file doesn't exist
+
+    return read_secrets_file(mtime)
+
 def save_secrets(secrets_data):
     """Saves API credentials to secrets.yml."""
     with open("secrets.yml", "w") as file:
@@ -76,6 +92,8 @@ def is_token_valid():
 def connect(account, apiclient, secret):
     """Connects to the AppDynamics API and retrieves an OAuth token."""
     global __session__, last_token_fetch_time, token_expiration
+    # every REST call goes through this session so the auth headers ride along and the
+    # keep-alive connection to the controller is reused instead of a new TLS handshake per request
     __session__ = requests.Session()
 
     url = f"{BASE_URL}/controller/api/oauth/access_token?grant_type=client_credentials&client_id={apiclient}@{account}&client_secret={secret}"
@@ -190,9 +208,8 @@ def get_SIM_availability(hierarchy_list, hostId, type):
     if DEBUG:
         print(f"        --- SIM availability metric url: {metric_url}")
 
-    metric_response = requests.get(
+    metric_response = __session__.get(
         metric_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
     
@@ -228,9 +245,8 @@ def get_apm_availability(object_type, app, tier, agenttype, node):
     if DEBUG:
         print("        --- metric url: " + metric_url)
 
-    metric_response = requests.get(
+    metric_response = __session__.get(
         metric_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
 
@@ -295,11 +311,11 @@ def validate_json(response):
                 if DEBUG:
                     print(f"        --- response data is valid. status = {data_status}")
                 
-                #convert response data to JSON
-                data = data.json()
+                #convert response data to JSON, the parser takes the raw bytes so the body isn't decoded to a str first
+                data = json_loads(data.content)
         
         elif isinstance(response, requests.Response):  
-            data = response.json()
+            data = json_loads(response.content)
             data_status = "valid"
 
         elif isinstance(response, dict):  
@@ -316,13 +332,21 @@ def validate_json(response):
         #if the data made it this far, then...
         return data, data_status
 
-    except json.JSONDecodeError:
-        # The data is not valid JSON.
+    except ValueError:
+        # The data is not valid JSON. ValueError also covers the UnicodeDecodeError json.loads raises
+        # on a body that isn't UTF-8 once it is handed bytes, and orjson.JSONDecodeError
         if DEBUG:
             print("            --- The data is not valid JSON.")
             print(response.text)
         return None, "error"
 
+# the boolean and missing value spellings pandas' text parsers recognize when reading XML values
+XML_BOOLEANS = {'True': True, 'true': True, 'TRUE': True, 'False': False, 'false': False, 'FALSE': False}
+XML_NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
 def validate_and_parse_xml(response, xpath):
     """
     Validates an XML response and converts it to a pandas DataFrame.
@@ -336,25 +360,64 @@ def validate_and_parse_xml(response, xpath):
             - pandas.DataFrame: The DataFrame if successful, or an empty DataFrame if no data is found.
             - str: Status string ("valid", "empty", or "error").
     """
+    # a failed REST call hands us the error text or exception instead of a response, nothing to parse
+    if not isinstance(response, requests.Response):
+        return pd.DataFrame(), "error"
+
     try:
-        if not response.content.decode().strip():  # Check for empty XML (after decoding)
+        if not response.content.strip():  # Check for empty XML, on the raw bytes so the body is never decoded to a str
             return pd.DataFrame(), "empty"
 
-        xml_content = StringIO(response.content.decode())
-        
-        # Use pd.read_xml directly with the provided xpath
-        df = pd.read_xml(xml_content, xpath=xpath)
-        
-        if df.empty:
-            return df, "empty"
-        else:
-            return df, "valid"
+        # stream the records straight off the response bytes instead of building a decoded copy and a full tree for
+        # pd.read_xml. each record is turned into a dict the same way read_xml does it (attributes, own text, then the
+        # text of its direct children) and cleared along with the records before it once read
+        record_tag = xpath.rsplit("/", 1)[-1]
+        records = []
+
+        for _, elem in etree.iterparse(BytesIO(response.content), events=("end",), tag=record_tag):
+            record = dict(elem.attrib)
+            if elem.text and not elem.text.isspace():
+                record[elem.tag] = elem.text
+            record.update({child.tag: child.text if child.text else None for child in elem.iterchildren("*")})
+            records.append(record)
+
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+        if not records:
+            raise ValueError(f"xpath {xpath} does not return any nodes.")
+
+        # line every record up on the full set of tags, then type the text columns the way read_xml does:
+        # missing value markers like N/A and null become NaN, true/false become booleans and numbers become
+        # numeric so ids stay integers for the later joins
+        columns = list(dict.fromkeys(tag for record in records for tag in record))
+        df = pd.DataFrame.from_records(records, columns=columns)
+
+        for col in columns:
+            missing = df[col].isin(XML_NA_VALUES)
+            if missing.any():
+                df[col] = df[col].mask(missing)
+
+            values = df[col].dropna()
+            if len(values) and values.isin(XML_BOOLEANS).all():
+                df[col] = df[col].map(XML_BOOLEANS)
+            else:
+                try:
+                    df[col] = pd.to_numeric(df[col])
+                except ValueError:
+                    pass  # real text, leave it as strings
 
-    except Exception as e:
-        error_type, error_value, _ = sys.exc_info()
-        print(f"An exception occurred converting XML to DataFrame: {error_type.__name__}: {error_value}")
+    except (etree.XMLSyntaxError, ValueError) as e:
+        # undecodable or malformed XML, or the xpath matched nothing
+        print(f"An exception occurred converting XML to DataFrame: {type(e).__name__}: {e}")
         return pd.DataFrame(), "error"  # Return an empty DataFrame on error
 
+    if df.empty:
+        return df, "empty"
+    else:
+        return df, "valid"
+
 def determine_availability(metric_data, metric_data_status):
     """Processes returned metric JSON data"""
     if DEBUG:
@@ -385,6 +448,10 @@ def determine_availability(metric_data, metric_data_status):
     else:
         return None, None
 
+def epoch_ms_to_datetime(series):
+    """converts a column of epoch milliseconds to datetimes in one vectorized pass, blanks and bad values become NaT"""
+    return pd.to_datetime(pd.to_numeric(series, errors="coerce"), unit="ms", errors="coerce")
+
 @handle_rest_errors
 def get_applications():
     """Get a list of all applications"""
@@ -403,14 +470,33 @@ def get_applications():
         if DEBUG:
             print("--- from "+applications_url)
     
-    applications_response = requests.get(
+    applications_response = __session__.get(
         applications_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
 
     return applications_response
 
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_applications(account, apiclient, secret):
+    """logs in and returns the applications list as a DataFrame, cached per set of credentials for 10 minutes.
+    returns None when the list could not be retrieved"""
+    authenticate("initial")
+
+    applications_response = get_applications()
+    applications, applications_status = validate_json(applications_response)
+
+    if applications_status != "valid":
+        return None
+
+    applications_df = pd.DataFrame(applications)
+    applications_df.rename(columns={
+        "id": "app_id",
+        "name": "app_name"
+    }, inplace=True)
+
+    return applications_df
+
 def refresh_applications():
     global APPDYNAMICS_ACCOUNT_NAME, APPDYNAMICS_API_CLIENT, APPDYNAMICS_API_CLIENT_SECRET, BASE_URL, application_id
     APPDYNAMICS_ACCOUNT_NAME = account_name
@@ -419,23 +505,17 @@ def refresh_applications():
     BASE_URL = "https://"+APPDYNAMICS_ACCOUNT_NAME+".saas.appdynamics.com"
     application_id = None
 
-    authenticate("initial")
-    
     with st.spinner('Retrieving applications...'):  
-        applications_response = get_applications()
-        applications, applications_status = validate_json(applications_response)
-
-    if applications_status == "valid":
-        applications_df = pd.DataFrame(applications)
-        applications_df = applications_df.rename(columns={
-            "id": "app_id",
-            "name": "app_name"
-        })
+        applications_df = fetch_applications(APPDYNAMICS_ACCOUNT_NAME, APPDYNAMICS_API_CLIENT, APPDYNAMICS_API_CLIENT_SECRET)
 
+    if applications_df is not None:
         st.session_state['applications_df'] = applications_df  # Store in session state
 
         if DEBUG:
             debug_df(applications_df, "applications_df")
+    else:
+        #don't hold on to a failed lookup, the next connect should try the controller again
+        fetch_applications.clear()
     
     st.rerun()
 
@@ -452,9 +532,8 @@ def get_tiers(application_id):
     if not is_token_valid():
         authenticate("reauth")
 
-    tiers_response = requests.get(
+    tiers_response = __session__.get(
         tiers_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
     #if DEBUG:
@@ -474,9 +553,8 @@ def get_app_nodes(application_id):
     if not is_token_valid():
         authenticate("reauth")
 
-    nodes_response = requests.get(
+    nodes_response = __session__.get(
         nodes_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
 
@@ -497,9 +575,8 @@ def get_tier_nodes(application_id, tier_id):
     if not is_token_valid():
         authenticate("reauth")
         
-    nodes_response = requests.get(
+    nodes_response = __session__.get(
         nodes_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
 
@@ -520,9 +597,8 @@ def get_app_backends(application_id):
     if not is_token_valid():
         authenticate("reauth")
 
-    backends_response = requests.get(
+    backends_response = __session__.get(
         backends_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
 
@@ -547,9 +623,8 @@ def get_snapshots(application_id):
     if not is_token_valid():
         authenticate("reauth")
 
-    snapshots_response = requests.get(
+    snapshots_response = __session__.get(
         snapshots_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
     
@@ -571,9 +646,8 @@ def get_bts(application_id):
     if not is_token_valid():
         authenticate("reauth")
 
-    bts_response = requests.get(
+    bts_response = __session__.get(
         bts_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
     if DEBUG:
@@ -594,9 +668,8 @@ def get_healthRules(application_id):
     if not is_token_valid():
         authenticate("reauth")
 
-    healthRules_response = requests.get(
+    healthRules_response = __session__.get(
         healthRules_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
     #if DEBUG:
@@ -616,38 +689,86 @@ def get_servers():
     if not is_token_valid():
         authenticate("reauth")
 
-    servers_response = requests.get(
+    servers_response = __session__.get(
         servers_url,
-        headers = __session__.headers,
         verify = VERIFY_SSL
     )
 
     return servers_response
 
+# the only columns of the merged nodes frame that the license math reads
+LICENSE_COLUMNS = ['Node - Agent Type', 'App Agent Version', 'Server Type', 'hostId', 'Node Name']
+
+def hash_license_input(df):
+    """cache key for calculate_licenses, only the columns the license math reads are hashed.
+    the merged nodes frame also carries list and dict cells that pandas can't hash"""
+    return int(pd.util.hash_pandas_object(df[LICENSE_COLUMNS], index=True).sum())
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: hash_license_input})
 def calculate_licenses(df):
     license_data = []
 
+    # work on just the license columns as categoricals, the filters, groupbys and nunique counts below
+    # then run over small integer codes instead of hashing the strings every time
+    df = df[LICENSE_COLUMNS].astype('category')
+
+    # split the nodes by agent type once, each agent type below then picks up its slice instead of re-scanning the frame.
+    # observed=True so agent types that aren't in this data don't show up as empty groups
+    agent_groups = dict(tuple(df.groupby('Node - Agent Type', sort=False, observed=True)))
+
+    #use the names everyone knows
+    agent_names = {
+        'APP_AGENT': 'Java Agent',
+        'DOT_NET_APP_AGENT': '.NET Agent',
+        'NODEJS_APP_AGENT': 'NodeJS Agent',
+        'PYTHON_APP_AGENT': 'Python Agent',
+        'PHP_APP_AGENT': 'PHP Agent',
+        'GOLANG_SDK': 'Go Agent',
+        'WMB_AGENT': 'IIB Agent',
+        'MACHINE_AGENT': 'Machine Agent',
+        'DOT_NET_MACHINE_AGENT': '.NET Machine Agent',
+        'NATIVE_WEB_SERVER': 'Apache Agent'
+    }
+
     for agent_type in ['APP_AGENT', 'DOT_NET_APP_AGENT', 'NODEJS_APP_AGENT', 'PYTHON_APP_AGENT',
                        'PHP_APP_AGENT', 'GOLANG_SDK', 'WMB_AGENT', 'MACHINE_AGENT', 'DOT_NET_MACHINE_AGENT', 
                        'NATIVE_WEB_SERVER', 'NATIVE_SDK']:
 
+        agent_df = agent_groups.get(agent_type)
+
+        # most controllers only run a few agent types, report the rest as zero without slicing and counting empty frames
+        if agent_df is None:
+            if agent_type == 'NATIVE_SDK':
+                license_data.append({'Agent Type': 'SAP ABAP Agent', 'Licenses Required': 0})
+                license_data.append({'Agent Type': 'C++ Agent', 'Licenses Required': 0})
+            else:
+                license_data.append({
+                    'Agent Type': agent_names[agent_type],
+                    'Container Nodes': 0,
+                    'Physical Nodes': 0,
+                    'Physical Licenses (Mixed)': 0,
+                    'Microservices Licenses (Mixed)': 0,
+                    'Standard Licenses': 0
+                })
+            continue
+
         if agent_type == 'NATIVE_SDK':
-            agent_df = df[df['Node - Agent Type'] == agent_type]
-            sap_abap_df = agent_df[agent_df['App Agent Version'].str.contains('with HTTP SDK', na=False)]
-            cpp_df = agent_df[~agent_df['App Agent Version'].str.contains('with HTTP SDK', na=False)]
+            # the needle is a literal, search for it once as a plain substring and split on the same mask
+            http_sdk = agent_df['App Agent Version'].str.contains('with HTTP SDK', na=False, regex=False)
+            sap_abap_df = agent_df[http_sdk]
+            cpp_df = agent_df[~http_sdk]
 
             sap_abap_licenses = sap_abap_df['hostId'].nunique()
-            cpp_licenses = cpp_df['hostId'].nunique() // 3
-            if cpp_df['hostId'].nunique() % 3 > 0:
-                cpp_licenses += 1
+            # integer ceiling division, -(-n // k) rounds up without a second count and modulo check
+            cpp_licenses = -(-cpp_df['hostId'].nunique() // 3)
 
             license_data.append({'Agent Type': 'SAP ABAP Agent', 'Licenses Required': sap_abap_licenses})
             license_data.append({'Agent Type': 'C++ Agent', 'Licenses Required': cpp_licenses})
 
         else:
-            agent_df = df[df['Node - Agent Type'] == agent_type]
-            container_df = agent_df[agent_df['Server Type'] == 'CONTAINER']
-            physical_df = agent_df[agent_df['Server Type'] == 'PHYSICAL']
+            server_groups = dict(tuple(agent_df.groupby('Server Type', sort=False, observed=True)))
+            container_df = server_groups.get('CONTAINER', agent_df.iloc[0:0])
+            physical_df = server_groups.get('PHYSICAL', agent_df.iloc[0:0])
 
             if agent_type in ['DOT_NET_APP_AGENT', 'PYTHON_APP_AGENT', 'WMB_AGENT', 'NATIVE_SDK', 
                               'MACHINE_AGENT', 'DOT_NET_MACHINE_AGENT', 'NATIVE_WEB_SERVER']:
@@ -657,56 +778,23 @@ def calculate_licenses(df):
                 container_licenses = container_df['Node Name'].nunique()
                 physical_licenses = physical_df['Node Name'].nunique()
             elif agent_type == 'NODEJS_APP_AGENT':
-                container_licenses = 0
-                physical_licenses = 0
-                for host_id in agent_df['hostId'].unique():
-                    host_df = agent_df[agent_df['hostId'] == host_id]
-                    container_host_df = host_df[host_df['Server Type'] == 'CONTAINER']
-                    physical_host_df = host_df[host_df['Server Type'] == 'PHYSICAL']
-                    container_licenses += (container_host_df['Node Name'].nunique() // 10)
-                    if container_host_df['Node Name'].nunique() % 10 > 0:
-                        container_licenses += 1
-                    physical_licenses += (physical_host_df['Node Name'].nunique() // 10)
-                    if physical_host_df['Node Name'].nunique() % 10 > 0:
-                        physical_licenses += 1
+                # one license per started block of 10 nodes on each host, count every host in one groupby
+                # and round up with negative floor division rather than filtering the frame host by host
+                host_node_counts = agent_df.groupby(['hostId', 'Server Type'], observed=True)['Node Name'].nunique()
+                host_licenses = (-(-host_node_counts // 10)).groupby(level='Server Type', observed=True).sum()
+                container_licenses = int(host_licenses.get('CONTAINER', 0))
+                physical_licenses = int(host_licenses.get('PHYSICAL', 0))
             elif agent_type == 'GOLANG_SDK':
-                container_licenses = (container_df['Node Name'].nunique() // 3)
-                if container_df['Node Name'].nunique() % 3 > 0:
-                    container_licenses += 1
-                physical_licenses = (physical_df['Node Name'].nunique() // 3)
-                if physical_df['Node Name'].nunique() % 3 > 0:
-                    physical_licenses += 1
-
-            microservices_licenses = math.ceil(container_licenses / 5)
+                container_licenses = -(-container_df['Node Name'].nunique() // 3)
+                physical_licenses = -(-physical_df['Node Name'].nunique() // 3)
+
+            microservices_licenses = -(-container_licenses // 5)
             standard_licenses = physical_licenses
 
-            #use the names everyone knows
-            if agent_type != "NATIVE_SDK":
-                if agent_type == 'APP_AGENT':
-                    agent_type = 'Java Agent'
-                if agent_type == 'DOT_NET_APP_AGENT':
-                    agent_type = '.NET Agent'
-                if agent_type == 'NODEJS_APP_AGENT':
-                    agent_type = 'NodeJS Agent'
-                if agent_type == 'PYTHON_APP_AGENT':
-                    agent_type = 'Python Agent'
-                if agent_type == 'PHP_APP_AGENT':
-                    agent_type = "PHP Agent"
-                if agent_type == 'GOLANG_SDK':
-                    agent_type = 'Go Agent'
-                if agent_type == 'WMB_AGENT':
-                    agent_type = 'IIB Agent'
-                if agent_type == 'MACHINE_AGENT':
-                    agent_type = 'Machine Agent'
-                if agent_type == 'DOT_NET_MACHINE_AGENT':
-                    agent_type = '.NET Machine Agent'
-                if agent_type == 'NATIVE_WEB_SERVER':
-                    agent_type = 'Apache Agent'    
-                
             license_data.append({
-                'Agent Type': agent_type,
-                'Container Nodes': container_df.shape[0],
-                'Physical Nodes': physical_df.shape[0],
+                'Agent Type': agent_names[agent_type],
+                'Container Nodes': len(container_df),
+                'Physical Nodes': len(physical_df),
                 'Physical Licenses (Mixed)': physical_licenses,
                 'Microservices Licenses (Mixed)': microservices_licenses,
                 'Standard Licenses': standard_licenses
@@ -724,13 +812,87 @@ def debug_df(df, df_name, num_lines=10):
     st.write(f"Shape (rows, cols): {df.shape}")
     #st.write(f"Columns: {df.columns.to_list()}")
     st.write(f"First {num_lines} rows:")
-    st.write(df.head(num_lines).to_markdown(index=False, numalign='left', stralign='left'))
+    # handed to the frontend as an Arrow table rather than formatted cell by cell into a markdown string
+    st.dataframe(df.head(num_lines), hide_index=True)
+
+def construct_snapshot_links(df, base_url):
+    """creates a deep link for every snapshot in df, built with whole-column string concatenation instead of a call per row.
+    the link opens the snapshot viewer on a one hour window centered on the snapshot's server start time"""
+    #make the id fields strings so they can be concatenated into a URL
+    request_guid = df['requestGUID'].astype(str)
+    app_id = df['applicationId'].astype(str)
+    bt_id = df['businessTransactionId'].astype(str)
+
+    sst_begin = (df['serverStartTime'] - 1800000).astype(str)
+    sst_end = (df['serverStartTime'] + 1800000).astype(str)
+
+    return base_url + "/controller/#/location=APP_SNAPSHOT_VIEWER&requestGUID=" + request_guid + "&application=" + app_id + "&businessTransaction=" + bt_id + "&rsdTime=Custom_Time_Range.BETWEEN_TIMES." + sst_end + "." + sst_begin + ".60" + "&tab=overview&dashboardMode=force"
+
+def stringify_containers(df, first_entry=False):
+    """xlsxwriter only writes scalars, stringify the list, dict, tuple and set cells the same way pandas' to_excel does.
+
+    Only object columns can hold them, so each of those is checked once and rewritten only when it has any, which leaves
+    the row loop free to hand rows straight to write_row. With first_entry, lists keep just their first entry and
+    empty lists become blanks.
+    """
+    for column in df.columns[(df.dtypes == object).to_numpy()]:
+        is_container = df[column].map(lambda cell_value: isinstance(cell_value, (list, dict, tuple, set)))
+        if is_container.any():
+            containers = df[column][is_container]
+            if first_entry:
+                text = containers.map(lambda cell_value: (str(cell_value[0]) if cell_value else "") if isinstance(cell_value, list) else str(cell_value))
+            else:
+                text = containers.map(str)
+            df[column] = df[column].mask(is_container, text)
+
+    return df
+
+def blank_missing_values(df):
+    """Replaces NaN/None/NaT with empty strings ahead of the Excel write, only rewriting the columns that have gaps.
+
+    Gap columns are rebuilt as object arrays with the blanks dropped in through a numpy mask, which skips fillna's
+    block-by-block object handling and lets float, datetime and categorical columns take '' without a dtype clash.
+    """
+    missing = df.isna()
+    has_gaps = missing.any().to_numpy()
+
+    if has_gaps.any():
+        gap_columns = df.columns[has_gaps]
+        values = df[gap_columns].to_numpy(dtype=object)
+        values[missing[gap_columns].to_numpy()] = ''
+        df[gap_columns] = values
+
+    return df
+
+@st.cache_resource(show_spinner=False)
+def get_mixer():
+    '''imports pygame and initializes the mixer on first use, cached so reruns reuse the same mixer'''
+    import pygame
+
+    pygame.mixer.init()
+    return pygame.mixer
+
+def stream_sheet_rows(worksheet, df, row_formats, date_columns, date_formats, format_whole_row=True):
+    """writes the data rows of df to worksheet one tuple at a time, in order, so constant_memory can flush each row as it goes.
+
+    row_formats supplies one format per row (None for unformatted), format_whole_row applies it across the whole
+    Excel row instead of just the written cells. datetime cells in date_columns are written with the date twin of the row format.
+    """
+    for row_num, (row, row_format) in enumerate(zip(df.itertuples(index=False, name=None), row_formats), start=1):
+        if format_whole_row:
+            worksheet.set_row(row_num, None, row_format)
+            worksheet.write_row(row_num, 0, row)
+        else:
+            worksheet.write_row(row_num, 0, row, row_format)
+
+        for col_num in date_columns:
+            if row[col_num] != '':
+                worksheet.write_datetime(row_num, col_num, row[col_num], date_formats[row_format])
 
 def play_sound(file_path):
     '''file = realtive path and filename to wave file, wait (Boolean) wait for the file to finish playing or not'''
     try:
-        pygame.mixer.init()
-        sound = pygame.mixer.Sound(file_path)
+        sound = get_mixer().Sound(file_path)
         sound.play()
 
     except Exception as e:
@@ -776,7 +938,7 @@ if 'applications_df' in st.session_state:
     applications_df = st.session_state['applications_df']
 
     # Create a list of tuples (app_id, app_name)
-    app_names = [(row['app_id'], row['app_name']) for _, row in applications_df.iterrows()]
+    app_names = list(zip(applications_df['app_id'].tolist(), applications_df['app_name'].tolist()))
 
     # Insert "ALL APPS" at the beginning
     app_names.insert(0, ("ALL", "ALL APPS"))
@@ -788,7 +950,12 @@ if 'applications_df' in st.session_state:
     selected_apps = st.multiselect("Select applications:", display_names)
 
     # Get the selected app_ids (including "ALL APPS" if selected)
-    selected_app_ids = [app_id for app_id, name in app_names if name in selected_apps]
+    selected_names = set(selected_apps)
+    if "ALL APPS" in selected_names:
+        # every app gets pulled anyway, no need to match the rest of the names
+        selected_app_ids = ["ALL"]
+    else:
+        selected_app_ids = [app_id for app_id, name in app_names if name in selected_names]
 
     if selected_app_ids:
         application_id = ""
@@ -886,6 +1053,9 @@ if submitted and (retrieve_apm or retrieve_servers):
         if not selected_app_ids:
             if not application_id:
                 application_id = ""
+        elif len(selected_app_ids) == 1 and selected_app_ids[0] != "ALL":
+            # a single app can be requested by id, no need to pull every app and filter it back down
+            application_id = selected_app_ids[0]
         else:
             application_id = ""
 
@@ -909,7 +1079,9 @@ if submitted and (retrieve_apm or retrieve_servers):
     DEBUG = debug_output
 
     # Replace with the desired output file path and name or leave as it to create dynamically (recommended)
-    OUTPUT_EXCEL_FILE = APPDYNAMICS_ACCOUNT_NAME+"_analysis_"+datetime.date.today().strftime("%m-%d-%Y")+".xlsx"
+    # the date stamp is worked out once here and reused if the name is narrowed to a single app before writing
+    output_date = datetime.date.today().strftime("%m-%d-%Y")
+    OUTPUT_EXCEL_FILE = APPDYNAMICS_ACCOUNT_NAME+"_analysis_"+output_date+".xlsx"
 
     # Set the base URL for the AppDynamics REST API
     # --- replace this with your on-prem controller URL if you're on prem
@@ -952,12 +1124,12 @@ if submitted and (retrieve_apm or retrieve_servers):
 
             if applications_status == "valid":
                 applications_df = pd.DataFrame(applications)
-                applications_df = applications_df.rename(columns={
+                applications_df.rename(columns={
                     "id": "app_id",
                     "name": "app_name"
-                })
+                }, inplace=True)
                 
-                if selected_app_ids:
+                if selected_app_ids and not application_id:
                     # Filter the DataFrame based on selected_app_ids
                     if "ALL" in selected_app_ids:
                         applications_df = applications_df  # Keep all rows
@@ -967,6 +1139,11 @@ if submitted and (retrieve_apm or retrieve_servers):
                 if DEBUG:
                     debug_df(applications_df, "applications_df")
 
+                # app id and name get repeated down every tier, node, backend and health rule row,
+                # store them as categoricals sharing one set of categories so they survive the concats as int codes
+                app_id_dtype = pd.CategoricalDtype(applications_df['app_id'].unique())
+                app_name_dtype = pd.CategoricalDtype(applications_df['app_name'].unique())
+
                 st.write(f"Found {applications_df.shape[0]} applications.")
 
                 if snes:
@@ -976,10 +1153,28 @@ if submitted and (retrieve_apm or retrieve_servers):
                 now = datetime.datetime.now()
                 current_date_time = now.strftime("%Y-%m-%d %H:%M:%S")
 
-                information_df = pd.DataFrame({
-                    "setting": ["RUN_DATE","BASE_URL", "APPDYNAMICS_ACCOUNT_NAME", "APPDYNAMICS_API_CLIENT", "Selected Apps", "or application id", "APM availability (mins)", "Machine availability (mins)", "metric_rollup", "Retrieve snapshots", "Snapshot range (mins)"],
-                    "value": [current_date_time, BASE_URL, APPDYNAMICS_ACCOUNT_NAME, APPDYNAMICS_API_CLIENT, selected_apps, application_id, apm_metric_duration_mins, machine_metric_duration_mins, metric_rollup, pull_snapshots, snapshot_duration_mins]
-                })
+                information_df = pd.DataFrame.from_records([
+                    ("RUN_DATE", current_date_time),
+                    ("BASE_URL", BASE_URL),
+                    ("APPDYNAMICS_ACCOUNT_NAME", APPDYNAMICS_ACCOUNT_NAME),
+                    ("APPDYNAMICS_API_CLIENT", APPDYNAMICS_API_CLIENT),
+                    ("Selected Apps", ", ".join(selected_apps)),
+                    ("or application id", application_id),
+                    ("APM availability (mins)", apm_metric_duration_mins),
+                    ("Machine availability (mins)", machine_metric_duration_mins),
+                    ("metric_rollup", metric_rollup),
+                    ("Retrieve snapshots", pull_snapshots),
+                    ("Snapshot range (mins)", snapshot_duration_mins)
+                ], columns=["setting", "value"])
+
+                # per-app frames are collected here and concatenated once after the loop,
+                # concatenating inside the loop re-copies everything gathered so far on every app
+                bts_frames = []
+                tiers_frames = []
+                nodes_frames = []
+                backends_frames = []
+                healthRules_frames = []
+                snapshots_frames = []
 
                 # Process each application
                 st.write(f"Processing applications...")
@@ -997,12 +1192,12 @@ if submitted and (retrieve_apm or retrieve_servers):
                         if snes:
                             play_sound("sounds/smb_coin.wav")
                             
-                        bts_df['app_id'] = app_id
-                        bts_df = pd.DataFrame(bts_data)
-                        bts_df = bts_df.rename(columns={
+                        #validate_and_parse_xml already hands back a DataFrame, use it as-is
+                        bts_df = bts_data
+                        bts_df.rename(columns={
                             "id": "bt_id",
                             "name": "bt_name"
-                        })
+                        }, inplace=True)
 
                         if DEBUG:
                             print(f"App id:{app_id}")
@@ -1013,7 +1208,7 @@ if submitted and (retrieve_apm or retrieve_servers):
                         if snes:
                             play_sound("sounds/smb_coin.wav")
 
-                        all_bts_df = pd.concat([all_bts_df, bts_df])
+                        bts_frames.append(bts_df)
 
                     elif bts_status == "empty":
                         st.write(f"No business transactions found for {app_name}.")
@@ -1027,12 +1222,12 @@ if submitted and (retrieve_apm or retrieve_servers):
                     tiers, tiers_status = validate_json(tiers_response)
                     if tiers_status == "valid":
                         tiers_df = pd.DataFrame(tiers)
-                        tiers_df['app_id'] = app_id
-                        tiers_df['app_name'] = app_name
-                        tiers_df = tiers_df.rename(columns={
+                        tiers_df['app_id'] = pd.Series(app_id, index=tiers_df.index, dtype=app_id_dtype)
+                        tiers_df['app_name'] = pd.Series(app_name, index=tiers_df.index, dtype=app_name_dtype)
+                        tiers_df.rename(columns={
                             "id": "tier_id",
                             "name": "tier_name"
-                        })
+                        }, inplace=True)
                         
                         if DEBUG:
                             debug_df(tiers_df, "tiers_df")
@@ -1061,7 +1256,7 @@ if submitted and (retrieve_apm or retrieve_servers):
                             # (Optional) Filter out rows where 'Last Seen' is None
                             # tiers_df = toers_df.dropna(subset=['Last Seen Tier'])
 
-                        all_tiers_df = pd.concat([all_tiers_df, tiers_df])
+                        tiers_frames.append(tiers_df)
 
                     # Get and process nodes
                     st.write(f"Retrieving nodes for {app_name}...")
@@ -1069,15 +1264,15 @@ if submitted and (retrieve_apm or retrieve_servers):
                     nodes, nodes_status = validate_json(nodes_response)
                     if nodes_status == "valid":
                         nodes_df = pd.DataFrame(nodes)
-                        nodes_df['app_id'] = app_id
-                        nodes_df['app_name'] = app_name
-                        nodes_df = nodes_df.rename(columns={
+                        nodes_df['app_id'] = pd.Series(app_id, index=nodes_df.index, dtype=app_id_dtype)
+                        nodes_df['app_name'] = pd.Series(app_name, index=nodes_df.index, dtype=app_name_dtype)
+                        nodes_df.rename(columns={
                             "id": "node_id",
                             "name": "node_name"
-                        })
+                        }, inplace=True)
 
-                        #cleanup the machine name removing -java-MA
-                        nodes_df['machineName-cleaned'] = nodes_df['machineName'].astype(str).str.replace('-java-MA$', '', regex=True)
+                        #cleanup the machine name removing -java-MA - a plain suffix strip, no regex engine needed
+                        nodes_df['machineName-cleaned'] = [name.removesuffix('-java-MA') for name in nodes_df['machineName'].astype(str)]
 
                         if DEBUG:
                             debug_df(nodes_df, "nodes_df")
@@ -1104,7 +1299,7 @@ if submitted and (retrieve_apm or retrieve_servers):
                             # (Optional) Filter out rows where last_seen is None
                             # nodes_df = nodes_df.dropna(subset=['last_seen'])
 
-                        all_nodes_df = pd.concat([all_nodes_df, nodes_df])
+                        nodes_frames.append(nodes_df)
 
                         if snes:
                             play_sound("sounds/smb_powerup.wav")
@@ -1118,12 +1313,12 @@ if submitted and (retrieve_apm or retrieve_servers):
                     backends, backends_status = validate_json(backends_response)
                     if backends_status == "valid":
                         backends_df = pd.DataFrame(backends)
-                        backends_df['app_id'] = app_id
-                        backends_df['app_name'] = app_name
-                        backends_df = backends_df.rename(columns={
+                        backends_df['app_id'] = pd.Series(app_id, index=backends_df.index, dtype=app_id_dtype)
+                        backends_df['app_name'] = pd.Series(app_name, index=backends_df.index, dtype=app_name_dtype)
+                        backends_df.rename(columns={
                             "id": "backend_id",
                             "name": "backend_name"
-                        })
+                        }, inplace=True)
                         
                         if DEBUG:
                             debug_df(backends_df, "backends_df")
@@ -1131,7 +1326,7 @@ if submitted and (retrieve_apm or retrieve_servers):
                     
                         st.write(f"Found {backends_df.shape[0]} backends for {app_name}.")
                         
-                        all_backends_df = pd.concat([all_backends_df, backends_df])
+                        backends_frames.append(backends_df)
 
                         if snes:
                             play_sound("sounds/smb_coin.wav")
@@ -1145,15 +1340,15 @@ if submitted and (retrieve_apm or retrieve_servers):
                     healthRules, healthRules_status = validate_json(healthRules_response)
                     if healthRules_status == "valid":
                         healthRules_df = pd.DataFrame(healthRules)
-                        healthRules_df['app_id'] = app_id
-                        healthRules_df['app_name'] = app_name
+                        healthRules_df['app_id'] = pd.Series(app_id, index=healthRules_df.index, dtype=app_id_dtype)
+                        healthRules_df['app_name'] = pd.Series(app_name, index=healthRules_df.index, dtype=app_name_dtype)
                         
                         if DEBUG:
                             debug_df(healthRules_df, "healthRules_df")
 
                         st.write(f"Found {healthRules_df.shape[0]} health rules for {app_name}.")
 
-                        all_healthRules_df = pd.concat([all_healthRules_df, healthRules_df])
+                        healthRules_frames.append(healthRules_df)
 
                         if snes:
                             play_sound("sounds/smb_coin.wav")
@@ -1172,28 +1367,8 @@ if submitted and (retrieve_apm or retrieve_servers):
                             if snes:
                                 play_sound("sounds/smb_coin.wav")
                             
-                            snapshots_df['app_id'] = app_id
-                            snapshots_df = pd.DataFrame(snapshots_data)
-
-                            def contruct_snapshot_link(row):
-                                '''creates a deep link for each snapshot'''
-                                #make the id fields strings so they can be concatenated into a URL
-                                request_guid = str(row['requestGUID'])
-                                app_id = str(row['applicationId'])
-                                bt_id = str(row['businessTransactionId'])
-                                
-                                #print(f"request_guid: {request_guid}, app_id: {app_id}, bt_id: {bt_id}")
-                                
-                                serverStartTime = row['serverStartTime']
-                                a = serverStartTime-1800000
-                                b = serverStartTime+1800000
-                                sst_begin = str(a)
-                                sst_end = str(b)
+                            snapshots_df = snapshots_data
 
-                                snapshot_link = BASE_URL + "/controller/#/location=APP_SNAPSHOT_VIEWER&requestGUID=" + request_guid + "&application=" + app_id + "&businessTransaction=" + bt_id + "&rsdTime=Custom_Time_Range.BETWEEN_TIMES." + sst_end + "." + sst_begin + ".60" + "&tab=overview&dashboardMode=force"
-                                
-                                return snapshot_link
-                        
                             if DEBUG:
                                 debug_df(snapshots_df, "snapshots_df")
 
@@ -1203,11 +1378,9 @@ if submitted and (retrieve_apm or retrieve_servers):
                             st.write(f"Creating deep links for snapshots in {app_name}...")
                             print(f"Creating deep links for snapshots in {app_name}...")
                             
-                            snapshots_df['snapshot_link'] = snapshots_df.apply(contruct_snapshot_link, axis=1)
+                            snapshots_df['snapshot_link'] = construct_snapshot_links(snapshots_df, BASE_URL)
 
-                            all_snapshots_df = pd.concat([all_snapshots_df, snapshots_df])
-                            st.write("merged snapshots_df into all_snapshots_df")
-                            debug_df(all_snapshots_df, "all_snapshots_df")
+                            snapshots_frames.append(snapshots_df)
 
                             if snes:
                                 play_sound("sounds/smb_1-up.wav")
@@ -1221,6 +1394,21 @@ if submitted and (retrieve_apm or retrieve_servers):
                             print(f"Snapshot response not valid! status: {snapshots_status}")
                             st.write(f"Snapshot response not valid! status: {snapshots_status}")
                             keep_status_open = True
+
+                # combine the per-app results, ignore_index so the combined frames get a clean unique index
+                if bts_frames:
+                    all_bts_df = pd.concat(bts_frames, ignore_index=True)
+                if tiers_frames:
+                    all_tiers_df = pd.concat(tiers_frames, ignore_index=True)
+                if nodes_frames:
+                    all_nodes_df = pd.concat(nodes_frames, ignore_index=True)
+                if backends_frames:
+                    all_backends_df = pd.concat(backends_frames, ignore_index=True)
+                if healthRules_frames:
+                    all_healthRules_df = pd.concat(healthRules_frames, ignore_index=True)
+                if snapshots_frames:
+                    all_snapshots_df = pd.concat(snapshots_frames, ignore_index=True)
+                del bts_frames, tiers_frames, nodes_frames, backends_frames, healthRules_frames, snapshots_frames
             
             else:
                 st.write(f"No application data found. status: {applications_status} data:{applications}")
@@ -1265,115 +1453,88 @@ if submitted and (retrieve_apm or retrieve_servers):
         #Convert epoch timestamps to datetime
         if retrieve_apm:
             if pull_snapshots:
-                if not all_snapshots_df.empty:
+                if len(all_snapshots_df.index):
                     st.write("Converting snapshot epoch timestamps to datetimes...")
                     print("Converting snapshot epoch timestamps to datetimes...")
                     if snes:
                         play_sound("sounds/smb_kick.wav")
 
-                    all_snapshots_df['start_time'] = pd.to_datetime(all_snapshots_df['serverStartTime'], unit='ms', errors="ignore")
-                    all_snapshots_df['local_start_time'] = pd.to_datetime(all_snapshots_df['localStartTime'], unit='ms', errors="ignore") 
-
-                    # If you need to format them to a specific string representation
-                    all_snapshots_df['start_time'] = all_snapshots_df['start_time'].dt.strftime('%m/%d/%Y %I:%M:%S %p') 
-                    all_snapshots_df['local_start_time'] = all_snapshots_df['local_start_time'].dt.strftime('%m/%d/%Y %I:%M:%S %p')
+                    # coerced to numbers first so the parse stays on the fast epoch path, left as datetimes for the
+                    # Excel writer to format the same way as the Last Seen columns
+                    all_snapshots_df['start_time'] = epoch_ms_to_datetime(all_snapshots_df['serverStartTime'])
+                    all_snapshots_df['local_start_time'] = epoch_ms_to_datetime(all_snapshots_df['localStartTime'])
             
-            if calc_apm_availability:    
-                if not all_tiers_df.empty:
-                    st.write("Converting tier epoch timestamps to datetimes...")
-                    print("Converting tier epoch timestamps to datetimes...")
-                    if snes:
-                        play_sound("sounds/smb_kick.wav")
-
-                    if DEBUG:
-                        debug_df(all_tiers_df, "all_tiers_df - post availability checks")
-
-                    all_tiers_df['Last Seen Tier'] = pd.to_datetime(all_tiers_df['Last Seen Tier'], unit='ms')
-                    
-                    # format them to a specific string representation
-                    all_tiers_df['Last Seen Tier'] = all_tiers_df['Last Seen Tier'].dt.strftime('%m/%d/%Y %I:%M:%S %p') 
-                    
-                if not all_nodes_df.empty:
-                    st.write("Converting node epoch timestamps to datetimes...")
-                    print("Converting node epoch timestamps to datetimes...")
-                    if snes:
-                        play_sound("sounds/smb_kick.wav")
-
-                    if DEBUG:
-                        debug_df(all_nodes_df, "all_nodes_df - post avaialability checks")
-
-                    all_nodes_df['Last Seen Node'] = pd.to_datetime(all_nodes_df['Last Seen Node'], unit='ms') 
+        # Last Seen columns only exist when the matching availability check ran. They stay real datetimes,
+        # the Excel writer gives them a date number format so they sort and filter as dates
+        last_seen_columns = []
+        if retrieve_apm and calc_apm_availability:
+            last_seen_columns.append(("tier", all_tiers_df, "Last Seen Tier"))
+            last_seen_columns.append(("node", all_nodes_df, "Last Seen Node"))
+        if retrieve_servers and calc_machine_availability:
+            last_seen_columns.append(("server", all_servers_df, "Last Seen Server"))
+
+        for object_type, last_seen_df, last_seen_column in last_seen_columns:
+            if len(last_seen_df.index):
+                st.write(f"Converting {object_type} epoch timestamps to datetimes...")
+                print(f"Converting {object_type} epoch timestamps to datetimes...")
+                if snes:
+                    play_sound("sounds/smb_kick.wav")
 
-                    # format them to a specific string representation
-                    all_nodes_df['Last Seen Node'] = all_nodes_df['Last Seen Node'].dt.strftime('%m/%d/%Y %I:%M:%S %p')
-            
-        if retrieve_servers:
-            if calc_machine_availability:
-                if not all_servers_df.empty:
-                    st.write("Converting server epoch timestamps to datetimes...")
-                    print("Converting server epoch timestamps to datetimes...")
-                    if snes:
-                        play_sound("sounds/smb_kick.wav")
+                if DEBUG:
+                    debug_df(last_seen_df, f"all_{object_type}s_df - post availability checks")
 
-                    if DEBUG:
-                        debug_df(all_servers_df, "all_servers_df - post availability checks")
+                last_seen_df[last_seen_column] = epoch_ms_to_datetime(last_seen_df[last_seen_column])
 
-                    all_servers_df['Last Seen Server'] = pd.to_datetime(all_servers_df['Last Seen Server'], unit='ms')
-                    all_servers_df['Last Seen Server'] = all_servers_df['Last Seen Server'].dt.strftime('%m/%d/%Y %I:%M:%S %p')    
+        # let go of the loop's references to the tier, node and server frames, otherwise they outlive the
+        # all_nodes_df purge after the server merge and the per-sheet release in the Excel write
+        last_seen_columns = last_seen_df = None
 
         #merge things
         st.write("Performing merge on data to make it human-friendly...")
 
         # Merge the snapshots data with app, bt, tier and node data
-        if not all_snapshots_df.empty and not applications_df.empty and not all_tiers_df.empty and not all_nodes_df.empty and not all_bts_df.empty:
+        if len(all_snapshots_df.index) and len(applications_df.index) and len(all_tiers_df.index) and len(all_nodes_df.index) and len(all_bts_df.index):
             if DEBUG:
                 st.write("Performing merge on snapshots data...")
                 print("Performing merge on snapshots data...")
 
-            all_snapshots_merged_df = pd.merge(
-                all_snapshots_df, all_tiers_df, left_on="applicationComponentId", right_on="tier_id", how="left", suffixes=(None, "_tier")
-            ).merge(
-                all_nodes_df, left_on="applicationComponentNodeId", right_on="node_id", how="left", suffixes=(None, "_node")
-            ).merge(
-                all_bts_df, left_on="businessTransactionId", right_on="bt_id", how="left", suffixes=(None, "_bt")
-            ).merge(
-                applications_df, left_on="applicationId", right_on="app_id", how="left", suffixes=(None, "_app")
-            )  
-
-            #delete the all_snapshots_df to free up RAM
+            # only carry the columns the snapshots sheet keeps through the joins, everything else would be
+            # copied into the merged frame just to be dropped again afterwards
+            tiers_lookup_df = all_tiers_df.drop(columns=['numberOfNodes', 'description'], errors='ignore')
+            nodes_lookup_df = all_nodes_df.drop(columns=['app_id', 'app_name', 'agentType', 'ipAddresses', 'nodeUniqueLocalId', 'appAgentPresent'], errors='ignore')
+            bts_lookup_df = all_bts_df.drop(columns=['tierId', 'tierName', 'entryPointTypeString'], errors='ignore')
+            apps_lookup_df = applications_df.drop(columns=['app_name', 'description'], errors='ignore')
+
+            # look each id up against a frame indexed on its key, drop=False keeps the tier and node key
+            # columns and the rsuffix values match the old merge suffixes so the merged columns are unchanged
+            all_snapshots_merged_df = all_snapshots_df.join(
+                tiers_lookup_df.set_index("tier_id", drop=False), on="applicationComponentId", how="left", rsuffix="_tier"
+            ).join(
+                nodes_lookup_df.set_index("node_id", drop=False), on="applicationComponentNodeId", how="left", rsuffix="_node"
+            ).join(
+                bts_lookup_df.set_index("bt_id"), on="businessTransactionId", how="left", rsuffix="_bt"
+            ).join(
+                apps_lookup_df.set_index("app_id"), on="applicationId", how="left", rsuffix="_app"
+            )
+
+            #delete the all_snapshots_df and lookup frames to free up RAM
             if DEBUG:
                 st.write("purging all_snapshots_df and performing GC to free RAM...")
                 print("purging all_snapshots_df and performing GC to free RAM...")
-            del all_snapshots_df
+            del all_snapshots_df, tiers_lookup_df, nodes_lookup_df, bts_lookup_df, apps_lookup_df
             gc.collect()
 
-            #drop the redundant columns
+            #drop the snapshot's own redundant columns, the lookup frames were trimmed before the join
             if DEBUG:
                 print("Removing redundant columns from merge...")
                 st.write("Doing some cleanup...")
               
             all_snapshots_merged_df.drop(columns=[
                 'accountGuid',
-                'app_id_tier',
-                'app_id_node',
-                'app_id_app',
-                'app_name_app',
-                'app_name_node',
-                'agentType_node',
                 'applicationId',
-                'appAgentPresent',
-                'bt_id',
-                'description',
-                'description_app',
-                'entryPointTypeString',
                 'id',
-                'ipAddresses',
                 'localID',
-                'nodeUniqueLocalId',
-                'numberOfNodes',
-                'serverStartTime',
-                'tierId_bt',
-                'tierName_bt']
+                'serverStartTime']
             , inplace=True, errors='ignore')
             
         else:
@@ -1382,16 +1543,19 @@ if submitted and (retrieve_apm or retrieve_servers):
                 print("all_snapshots_df is empty, skipping merge...")
 
         #merge node and server data 
-        if retrieve_apm and retrieve_servers and not all_nodes_df.empty and not all_servers_df.empty:
+        if retrieve_apm and retrieve_servers and len(all_nodes_df.index) and len(all_servers_df.index):
             if DEBUG:
                 st.write("Performing merge on servers data...")
                 print("--- Merging node and machine data.")
             
             st.write("Merging node and machine data...")
             
-            all_nodes_merged_df = pd.merge (
-                all_nodes_df, all_servers_df, left_on="machineName-cleaned", right_on="name", how="left", suffixes=(None, "_servers")
-            )
+            # look nodes up against the servers indexed on name, drop=False keeps the name column like the merge did.
+            # a hostname shared by several machines repeats the node's index label, so renumber the rows like the merge
+            # did, the property columns are joined back on this index further down
+            all_nodes_merged_df = all_nodes_df.join(
+                all_servers_df.set_index("name", drop=False), on="machineName-cleaned", how="left", rsuffix="_servers"
+            ).reset_index(drop=True)
             
             #delete the all_nodes_df to free up RAM
             if DEBUG:
@@ -1411,28 +1575,26 @@ if submitted and (retrieve_apm or retrieve_servers):
                         prefix (str): The prefix to add to the column names.
 
                     Returns:
-                        pd.Series: A Series containing the parsed data, with NaN values for missing keys and prefixed column names.
+                        dict: The parsed data keyed by column name, empty when there is nothing to parse.
                     """
 
                     if isinstance(data, dict):
-                        result = pd.Series(dtype='object')
+                        # Group all the disks together and keep the remaining data, split in a single pass over the keys
+                        disk_data = {}
+                        remaining_data = {}
+                        for k, v in data.items():
+                            if k.startswith('Disk|'):
+                                disk_data[k] = v
+                            else:
+                                remaining_data[k] = v
 
-                        # Group all the disks together
-                        disk_data = {k: v for k, v in data.items() if k.startswith('Disk|')}
                         if disk_data:
-                            #result[prefix + "|Disk"] = [disk_data]
-                            result["Disk"] = str(disk_data)
+                            return {"Disk": str(disk_data), **remaining_data}
 
-                        # Parse the remaining data (excluding 'Disk' sub-properties)
-                        remaining_data = {k: v for k, v in data.items() if not k.startswith('Disk|')}
-                        #result = pd.concat([result, pd.Series(remaining_data).add_prefix(prefix + "|")])
-                        result = pd.concat([result, pd.Series(remaining_data)])
-                        return result
+                        return remaining_data
 
-                    elif isinstance(data, list) and len(data) == 0:  # Empty list
-                        return pd.Series(dtype='object')  # Empty Series
-                    else:  # None or other unexpected values
-                        return pd.Series(dtype='object')  # Empty Series
+                    else:  # Empty list, None or other unexpected values
+                        return {}
 
                 try:
                     columns_to_parse = ['properties', 'memory', 'cpus']  # Add more column names if needed
@@ -1443,7 +1605,11 @@ if submitted and (retrieve_apm or retrieve_servers):
                             st.write(f"Attempting to parse {col}")
                             print(f"Attempting to parse {col}")
                         
-                        parsed_df = all_nodes_merged_df[col].apply(parse_properties, args=(col,))
+                        # build the parsed frame in one go from plain dicts rather than a Series per row
+                        parsed_df = pd.DataFrame.from_records(
+                            [parse_properties(data, col) for data in all_nodes_merged_df[col].to_numpy()],
+                            index=all_nodes_merged_df.index
+                        )
 
                         # Join the parsed DataFrame back to the original DataFrame
                         if DEBUG:
@@ -1459,10 +1625,14 @@ if submitted and (retrieve_apm or retrieve_servers):
                         
                         all_nodes_merged_df.drop(columns=[col], inplace=True)
                     
-                    #extract the goodies and leave the rest
-                    all_nodes_merged_df['Physical'] = all_nodes_merged_df['Physical'].apply(lambda x: x['sizeMb'] if isinstance(x, dict) and 'sizeMb' in x else x)
-                    all_nodes_merged_df['Swap'] = all_nodes_merged_df['Swap'].apply(lambda x: x['sizeMb'] if isinstance(x, dict) and 'sizeMb' in x else x)
-                    
+                    #extract the goodies and leave the rest, one pass over the values instead of a per-row apply call.
+                    #the Series constructor infers the dtype the same way apply did so integer sizes stay integers
+                    for col in ['Physical', 'Swap']:
+                        all_nodes_merged_df[col] = pd.Series(
+                            [value['sizeMb'] if isinstance(value, dict) and 'sizeMb' in value else value for value in all_nodes_merged_df[col].to_numpy()],
+                            index=all_nodes_merged_df.index
+                        )
+
 
                 except Exception as e:
                     st.write(f"An error occurred while parsing columns: {e}")
@@ -1474,10 +1644,10 @@ if submitted and (retrieve_apm or retrieve_servers):
                     print("All nodes merged with corresponding server data.")
                     debug_df(all_nodes_merged_df, "all_nodes_merged_df")
 
-            #drop unnecessary columns
+            #drop unnecessary columns and do some renaming in one pass
             if DEBUG:
-                st.write("Dropping unneeded columns from all_nodes_merged_df...")
-            all_nodes_merged_df.drop(columns=[
+                st.write("Dropping unneeded columns and renaming columns to be more readable in all_nodes_merged_df...")
+            columns_to_drop = {
                 'agentConfig',
                 'AppDynamics|Agent|JVM Info',
                 'AppDynamics|Agent|Agent Pid',
@@ -1486,12 +1656,9 @@ if submitted and (retrieve_apm or retrieve_servers):
                 'ipAddresses',
                 'machineAgentVersion',
                 'nodeUniqueLocalId'
-            ], inplace=True, errors='ignore')
+            }
 
-            #do some renaming
-            if DEBUG:
-                st.write("Renaming columns to be more readable in all_nodes_merged_df...")
-            all_nodes_merged_df.rename(columns={
+            column_renames = {
                 'agentType':'Node - Agent Type',
                 'appAgentVersion':'App Agent Version',
                 'app_name':'Application Name',
@@ -1514,10 +1681,15 @@ if submitted and (retrieve_apm or retrieve_servers):
                 'type':'Tier Type',
                 'volumes':'Volumes',
                 'vCPU': 'CPU vCPU'
-            }, inplace=True, errors='ignore') 
+            }
+
+            #select the kept columns once and relabel them in place rather than a drop pass and a rename pass
+            kept_columns = [column for column in all_nodes_merged_df.columns if column not in columns_to_drop]
+            all_nodes_merged_df = all_nodes_merged_df.loc[:, kept_columns]
+            all_nodes_merged_df.columns = [column_renames.get(column, column) for column in kept_columns]
  
         #generate licensing df
-        if retrieve_apm and retrieve_servers and not all_nodes_merged_df.empty:
+        if retrieve_apm and retrieve_servers and len(all_nodes_merged_df.index):
             st.write("Generating license usage information...")
             # Apply the function and display the result
             license_usage_df = calculate_licenses(all_nodes_merged_df)
@@ -1529,7 +1701,7 @@ if submitted and (retrieve_apm or retrieve_servers):
 
         #change the output file name to include app name if this is being run against a single app
         if len(applications_df) == 1:
-            OUTPUT_EXCEL_FILE = APPDYNAMICS_ACCOUNT_NAME+"-"+(applications_df["app_name"].iloc[0]).replace(" ", "_")+"-analysis_"+datetime.date.today().strftime("%m-%d-%Y")+".xlsx"
+            OUTPUT_EXCEL_FILE = APPDYNAMICS_ACCOUNT_NAME+"-"+(applications_df["app_name"].iloc[0]).replace(" ", "_")+"-analysis_"+output_date+".xlsx"
 
         st.write(f"Writing ourput to file: {OUTPUT_EXCEL_FILE}")
         if DEBUG:
@@ -1537,7 +1709,12 @@ if submitted and (retrieve_apm or retrieve_servers):
         
         # --- Write to Excel with formatting ---
         try:
-            with pd.ExcelWriter(OUTPUT_EXCEL_FILE, engine='xlsxwriter') as writer:
+            # constant_memory streams each row to disk as soon as the next one is started instead of holding every
+            # sheet in RAM, in exchange rows have to be written top to bottom and each row written in one go
+            with pd.ExcelWriter(OUTPUT_EXCEL_FILE, engine='xlsxwriter', engine_kwargs={'options': {
+                'constant_memory': True,
+                'strings_to_formulas': False
+            }}) as writer:
                 workbook = writer.book
                 # Define formats
                 header_format = workbook.add_format({
@@ -1554,25 +1731,56 @@ if submitted and (retrieve_apm or retrieve_servers):
                 even_row_format = workbook.add_format({
                     'border': 1
                     })  # White
+                
+                # snapshot row fills by userExperience, built once and shared by every row
+                user_experience_colors = {
+                    'NORMAL': '#90EE90',
+                    'ERROR': '#FA3B37',
+                    'SLOW': '#FFFF80',
+                    'VERY_SLOW': '#FC9C2D',
+                    'STALL': '#FF69CD'
+                    }
+                user_experience_formats = {
+                    user_experience: workbook.add_format({'bg_color': fill_color, 'border': 1})
+                    for user_experience, fill_color in user_experience_colors.items()
+                    }
+
+                # datetime cells need a number format of their own, which replaces the row fill,
+                # so each row format gets a twin that carries the date format as well
+                date_num_format = 'mm/dd/yyyy hh:mm:ss AM/PM'
+                date_formats = {
+                    None: workbook.add_format({'num_format': date_num_format}),
+                    odd_row_format: workbook.add_format({'bg_color': '#C2C2C2', 'border': 1, 'num_format': date_num_format}),
+                    even_row_format: workbook.add_format({'border': 1, 'num_format': date_num_format})
+                    }
+                for user_experience, fill_color in user_experience_colors.items():
+                    date_formats[user_experience_formats[user_experience]] = workbook.add_format({'bg_color': fill_color, 'border': 1, 'num_format': date_num_format})
 
                 #df to sheet mapping
-                for df_name, df in [
+                sheets = [
                     ("Info", information_df),
                     ("License Usage", license_usage_df),
                     ("Applications", applications_df),
                     ("BTs", all_bts_df),
                     ("Tiers", all_tiers_df),
-                    ("Nodes", all_nodes_merged_df),
+                    #handle case where user didn't pull servers and thus the merge never happened
+                    ("Nodes", all_nodes_merged_df if len(all_nodes_merged_df.index) else all_nodes_df),
                     ("Backends", all_backends_df),
                     ("Health Rules", all_healthRules_df),
                     ("Snapshots", all_snapshots_merged_df),
                     ("Servers", all_servers_df)
-                ]:
-                    #handle case where user didn't pull servers and thus the merge never happened
-                    if all_nodes_merged_df.empty and df_name == "Nodes":
-                        df = all_nodes_df
+                ]
 
-                    if not df.empty:
+                # leave the sheet list holding the only reference to each frame, popping them off as they are
+                # written then lets each sheet's memory go as soon as it is on disk instead of at the end of the run.
+                # rebinding (not del) because all_nodes_df may already be gone after the server merge
+                information_df = license_usage_df = applications_df = all_bts_df = all_tiers_df = None
+                all_nodes_df = all_nodes_merged_df = all_backends_df = all_healthRules_df = all_snapshots_merged_df = all_servers_df = None
+
+                while sheets:
+                    df_name, df = sheets.pop(0)
+
+                    if len(df.index):
                         if not df_name == "License Usage":
                             if DEBUG:
                                 print(f"Ordering {df_name}...")
@@ -1598,78 +1806,64 @@ if submitted and (retrieve_apm or retrieve_servers):
                                 print("Reordering the columns...")
                             
                             df = df[column_order]
-
-                            # Replace NaNs with empty strings before writing to Excel
-                            df.fillna('', inplace=True)
                         
                         else:
                             #ensure column headers are stings
                             df.columns = df.columns.astype(str)
-                            # Replace NaNs with empty strings before writing to Excel
-                            df.fillna('', inplace=True)
+
+                        # note the datetime columns before the blanks below turn them into plain objects
+                        date_columns = [col_num for col_num, dtype in enumerate(df.dtypes) if pd.api.types.is_datetime64_any_dtype(dtype)]
+
+                        # Replace NaNs with empty strings before writing to Excel
+                        df = blank_missing_values(df)
 
                         if DEBUG:
                             print(f"Writing {df_name} DataFrame...")
                             st.write(f"Writing {df_name} DataFrame...")
 
-                        df.to_excel(writer, sheet_name=df_name, index=False)
-                        
-                        # Get the worksheet and apply formatting
-                        worksheet = writer.sheets[df_name]
+                        worksheet = workbook.add_worksheet(df_name)
 
-                        # Auto-adjust column widths and add formatting
+                        # Auto-adjust column widths, column settings can be applied at any point in constant_memory mode
                         for col_num, value in enumerate(df.columns.values):
                             try:
-                                column_length = max(df[value].astype(str).map(len).max(), len(value))
+                                # .str.len() measures the whole column in one vectorized pass instead of calling len() per cell
+                                column_length = max(df[value].astype(str).str.len().max(), len(value))
                             except:
                                 column_length = 10
                             
+                            # dates are measured in their raw form, make room for the longer Excel rendering
+                            if col_num in date_columns:
+                                column_length = max(column_length, len(date_num_format))
+
                             #set a max column length
                             if column_length > 50:
                                 column_length = 50
 
                             worksheet.set_column(col_num, col_num, column_length + 2)
-                            worksheet.write(0, col_num, value, header_format)  # Format header
-                                    
+
+                        worksheet.write_row(0, 0, df.columns.values, header_format)  # Format header
+
                         # Apply alternating row colors (starting from the second row) except for the Snapshots sheet
                         if not df_name == "Snapshots":
-                            for row_num in range(1, df.shape[0] + 1):
-                                if row_num % 2 == 1:
-                                    worksheet.set_row(row_num, cell_format=odd_row_format)
-                                else:
-                                    worksheet.set_row(row_num, cell_format=even_row_format)
+                            df = stringify_containers(df)
+                            stream_sheet_rows(worksheet, df, itertools.cycle((odd_row_format, even_row_format)), date_columns, date_formats)
                             
                         # Coloring snapshot rows based on userExperience
                         if df_name == "Snapshots":
-                            for row_num in range(1, df.shape[0] + 1):
-                                user_experience = df.loc[row_num - 1, 'userExperience']
-
-                                if user_experience == 'NORMAL':
-                                    fill_color = '#90EE90' 
-                                elif user_experience == 'ERROR':
-                                    fill_color = '#FA3B37' 
-                                elif user_experience == 'SLOW':
-                                    fill_color = '#FFFF80' 
-                                elif user_experience == 'VERY_SLOW':
-                                    fill_color = '#FC9C2D' 
-                                elif user_experience == 'STALL':
-                                    fill_color = '#FF69CD'
-                                else:
-                                    continue 
-
-                                cell_format = workbook.add_format({'bg_color': fill_color, 'border': 1})
-                                for col_num in range(df.shape[1]):
-                                    cell_value = df.loc[row_num - 1, df.columns[col_num]]
-                                    
-                                    # Handle any list values
-                                    if isinstance(cell_value, list):
-                                        if len(cell_value) > 0:
-                                            cell_value = str(cell_value[0])  # Or any other appropriate conversion
-                                        else:
-                                            cell_value = ""  # Or any other default value you prefer for empty lists
-                                    
-
-                                    worksheet.write(row_num, col_num, cell_value, cell_format)
+                            # resolve every row's fill up front, userExperience only has a handful of values so
+                            # look each category up once and map the rows through their integer codes
+                            user_experience = df['userExperience'].astype('category')
+                            category_formats = [user_experience_formats.get(category) for category in user_experience.cat.categories]  # unknown experiences are left unformatted
+                            row_formats = [category_formats[code] if code >= 0 else None for code in user_experience.cat.codes.to_numpy()]
+
+                            # Handle any list values by keeping the first entry, empty lists become blanks
+                            df = stringify_containers(df, first_entry=True)
+
+                            stream_sheet_rows(worksheet, df, row_formats, date_columns, date_formats, format_whole_row=False)
+
+                        # the rows are flushed to disk, let go of this sheet's reordered and blanked copy before building the next
+                        del df
+                        gc.collect()
                         
                     else:
                         st.write(f"{df_name} empty, skipping write.")
@@ -1688,7 +1882,9 @@ if submitted and (retrieve_apm or retrieve_servers):
 
     status.update(label="Extraction complete!", state="complete", expanded=keep_status_open)
 
-    # Open the Excel file
+    # Open the Excel file, subprocess is only needed here so it is imported on the way out
+    import subprocess
+
     if sys.platform == "win32":
         os.startfile(OUTPUT_EXCEL_FILE) 
     elif sys.platform == "darwin":  # macOS